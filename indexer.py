@@ -1,119 +1,229 @@
+import gc
 import os
 import json
+import mmap
 import sys
 import time
 import psutil
+import orjson
+import queue
+import threading
 import collections
-from multiprocessing import Event, Process, Queue, cpu_count
-from typing import List, Dict, Optional
+import numpy as np
+import multiprocessing
+from multiprocessing import Process, Queue, cpu_count
+from typing import List, Dict, Optional, Tuple
 
 from indexer.arg_parser import parse_indexer_args
 from indexer.in_memory_indexer import InMemoryIndexer
-from indexer.index_merger import IndexMerger
+from indexer.index_merger import IndexMerger, DOCUMENT_RECORD
 from indexer.partial_index_writer import PartialIndexWriter
+from shared.file_hints import advise_sequential
 from shared.tokenizer import Tokenizer
 
 ONE_MB = 1024 * 1024
 
+# Per-document stage timers cost a clock_gettime each; only pay for them
+# when profiling is explicitly requested
+PROFILE = bool(os.environ.get('INDEXER_PROFILE'))
+
+def _invert_token_ids(token_ids: Dict[str, int]) -> List[str]:
+  """
+  Builds the reverse token-id mapping used when flushing the index to disk.
+
+  Args:
+    token_ids (Dict[str, int]): Mapping from token to worker-local id.
+
+  Returns:
+    List[str]: Token strings indexed by token id.
+  """
+  id_tokens = [""] * len(token_ids)
+  for token, token_id in token_ids.items():
+    id_tokens[token_id] = token
+  return id_tokens
+
+def _tokenize_stage(
+  input_queue: Queue,
+  batch_queue: "queue.Queue",
+  corpus_map: mmap.mmap,
+  tokenizer: Tokenizer,
+  tokenization_time_box: List[float]
+) -> None:
+  """
+  Tokenization stage of the worker pipeline, run on its own thread.
+
+  Parses and tokenizes each batch of corpus byte spans and hands the result
+  to the indexing stage, so the regex-heavy tokenizer overlaps with the
+  dict-heavy indexing loop instead of running in strict alternation.
+
+  Args:
+    input_queue (Queue): Queue with batches of (start, end) corpus byte spans.
+    batch_queue (queue.Queue): Bounded in-process queue to the indexing stage.
+    corpus_map (mmap.mmap): Read-only mapping of the corpus file.
+    tokenizer (Tokenizer): Tokenizer instance owned by this thread.
+    tokenization_time_box (List[float]): Single-element accumulator for timing.
+  """
+  while True:
+    spans = input_queue.get()
+    if spans is None:
+      # Propagate the end-of-stream sentinel to the indexing stage
+      batch_queue.put(None)
+      break
+
+    # Parse the documents straight out of the mapped corpus
+    docs = [orjson.loads(corpus_map[start:end]) for start, end in spans]
+
+    # Tokenize the whole batch in one call instead of once per document
+    if PROFILE:
+      tokenization_start = time.time()
+    token_lists = tokenizer.tokenize_batch([doc["text"] for doc in docs])
+    if PROFILE:
+      tokenization_time_box[0] += time.time() - tokenization_start
+
+    batch_queue.put((docs, token_lists))
+
 def index_worker(
   index_dir: str,
+  corpus_path: str,
   memory_budget_mb: int,
   input_queue: Queue,
   worker_id: int,
-  number_of_workers: int,
-  stop_event
+  number_of_workers: int
 ) -> None:
   """
   Worker function that indexes documents from the input queue.
 
   Args:
     index_dir (str): Path to save index files.
+    corpus_path (str): Path to the corpus file; each worker maps it read-only.
     memory_budget_mb (int): Max memory for in-memory indexer (in MB).
-    input_queue (Queue): Queue with document batches.
+    input_queue (Queue): Queue with batches of (start, end) corpus byte spans.
     worker_id (int): ID of the worker.
     number_of_workers (int): Total number of workers. Just for logging.
-    stop_event: Event to signal workers to stop.
   """
+  if hasattr(os, 'sched_setaffinity'):
+    # Pin each worker to its own core so its caches stay warm instead of the
+    # scheduler migrating workers between cores mid-run. The inherited mask
+    # is read first so only cores this process may actually use are picked
+    available_cores = sorted(os.sched_getaffinity(0))
+    os.sched_setaffinity(0, {available_cores[worker_id % len(available_cores)]})
+
   print(f"Worker {worker_id} started with memory budget: {memory_budget_mb} MB")
+
+  # The hot loop allocates no reference cycles, so the cycle collector only
+  # adds pauses; plain reference counting reclaims everything the loop frees
+  gc.disable()
+
   indexer = InMemoryIndexer(memory_budget_mb)
   writer = PartialIndexWriter(index_dir, worker_id)
   tokenizer = Tokenizer()
 
-  # Timing measurements
-  tokenization_time = 0.0
+  # Timing measurements; tokenization time is accumulated by its own thread
+  tokenization_time_box = [0.0]
   indexing_time = 0.0
   writing_time = 0.0
-  
+
   total_tokens = 0
   total_documents = 0
+  # Worker-local token-id mapping: unseen tokens get the next id on lookup
+  token_ids: Dict[str, int] = collections.defaultdict()
+  token_ids.default_factory = token_ids.__len__
+
+  # Map the corpus read-only; the pages are shared with the producer and the
+  # other workers through the page cache, so spans cost no IPC copies. A
+  # zero-length file cannot be mapped: no spans will arrive from an empty
+  # corpus, so the mapping is simply skipped
+  corpus_fp = open(corpus_path, 'rb')
+  if os.fstat(corpus_fp.fileno()).st_size > 0:
+    corpus_map = mmap.mmap(corpus_fp.fileno(), 0, access=mmap.ACCESS_READ)
+  else:
+    corpus_map = None
   # Create a document index file for this worker
-  document_index_path = os.path.join(index_dir, f'document_index_worker_{worker_id}.jsonl')
-  with open(document_index_path, 'a', encoding='utf-8') as document_index_fp:
-    while not stop_event.is_set():
-      try:
-        # Get a batch of documents from the input queue
-        batch = input_queue.get(timeout=1)
-      except Exception:
-        continue
+  document_index_path = os.path.join(index_dir, f'document_index_worker_{worker_id}.bin')
+  # Metadata records are gathered per batch and written with a single writev,
+  # so the file is kept unbuffered
+  document_index_lines: List[bytes] = []
+
+  # Tokenization runs on a separate thread so the re/stemmer work overlaps
+  # the indexing loop; the bound keeps at most a few batches in flight
+  batch_queue: "queue.Queue" = queue.Queue(maxsize=4)
+  tokenize_thread = threading.Thread(
+    target=_tokenize_stage,
+    args=(input_queue, batch_queue, corpus_map, tokenizer, tokenization_time_box),
+  )
+  tokenize_thread.start()
+
+  with open(document_index_path, 'ab', buffering=0) as document_index_fp:
+    while True:
+      # Block until the tokenization stage hands over the next batch; the
+      # stream always ends with a single None sentinel
+      batch = batch_queue.get()
       if batch is None:
         break
+      docs, token_lists = batch
 
-      for doc in batch:
-        if worker_id == 0 and total_documents % 1000 == 0:
+      for doc, tokens in zip(docs, token_lists):
+        if worker_id == 0 and total_documents % 10000 == 0:
           # Print progress assuming equal distribution of documents across workers
           print(f"Approximately {total_documents * number_of_workers} documents indexed so far")
 
         total_documents += 1
-        docid = doc["id"]
+        docid = int(doc["id"])
         text = doc["text"]
 
-        # Measure tokenization time
-        tokenization_start = time.time()
-        tokens = tokenizer.tokenize(text)
-        tokenization_time += time.time() - tokenization_start
-
         token_count = len(tokens)
         total_tokens += token_count
 
-        # Create a document metadata entry
-        document_metadata = {
-          "id": docid,
-          "character_count": len(text),
-          "token_count": token_count
-        }
-        # Write the document metadata to the document index file
-        document_index_fp.write(json.dumps(document_metadata) + "\n")
-
-        tokens_counter = collections.Counter(tokens)
-
-        # Measure indexing time
-        indexing_start = time.time()
-        memory_limit_reached = indexer.index_document(docid, tokens_counter)
-        indexing_time += time.time() - indexing_start
+        # Queue the document's fixed-size metadata record for the
+        # batch-level writev; json encoding happens once, at merge time
+        document_index_lines.append(DOCUMENT_RECORD.pack(docid, len(text), token_count))
+
+        # Measure indexing time only when profiling
+        if PROFILE:
+          indexing_start = time.time()
+        # Map tokens to worker-local ids and count frequencies in numpy's
+        # C kernel instead of hashing every occurrence through Counter
+        ids = np.fromiter((token_ids[token] for token in tokens), dtype=np.int32, count=token_count)
+        unique_ids, counts = np.unique(ids, return_counts=True)
+        memory_limit_reached = indexer.index_document_ids(docid, unique_ids, counts)
+        if PROFILE:
+          indexing_time += time.time() - indexing_start
 
         # Check if the memory limit is reached
         if memory_limit_reached:
           writing_start = time.time()
-          writer.write_to_disk(indexer.index)
+          writer.write_to_disk(indexer.index, _invert_token_ids(token_ids))
           writing_time += time.time() - writing_start
           indexer.reset_index()
 
+      # Write the whole batch's metadata with one gathered syscall
+      if document_index_lines:
+        os.writev(document_index_fp.fileno(), document_index_lines)
+        document_index_lines.clear()
+
     # Write any remaining index data to disk
     if indexer.index:
       writing_start = time.time()
-      writer.write_to_disk(indexer.index)
+      writer.write_to_disk(indexer.index, _invert_token_ids(token_ids))
       writing_time += time.time() - writing_start
 
+  tokenize_thread.join()
+  gc.enable()
+  if corpus_map is not None:
+    corpus_map.close()
+  corpus_fp.close()
+
   # Write worker statistics to a JSON file. This is done here to avoid tokenizing twice.
-  with open(os.path.join(index_dir, f'worker_{worker_id}_stats.json'), 'w') as stats_fp:
-    json.dump({
+  # The stats are serialized in memory and written with a single write call
+  with open(os.path.join(index_dir, f'worker_{worker_id}_stats.json'), 'wb') as stats_fp:
+    stats_fp.write(orjson.dumps({
       "total_tokens": total_tokens,
-    }, stats_fp)
+    }))
   
   print(f"Worker {worker_id} finished. Total documents indexed: {total_documents}, Total tokens: {total_tokens}")
-  if worker_id == 0:
+  if worker_id == 0 and PROFILE:
     print("Workers approximate timing statistics:")
-    print(f"Tokenization: {tokenization_time:.2f}s, Indexing: {indexing_time:.2f}s, Writing: {writing_time:.2f}s")
+    print(f"Tokenization: {tokenization_time_box[0]:.2f}s, Indexing: {indexing_time:.2f}s, Writing: {writing_time:.2f}s")
 
 class Indexer:
   """
@@ -137,13 +247,20 @@ class Indexer:
     self.document_index_path = os.path.join(self.index_dir, 'document_index.jsonl')
     self.lexicon_path = os.path.join(self.index_dir, 'lexicon.jsonl')
 
-    self.index_merger = IndexMerger(self.index_dir, self.final_index_path, self.document_index_path, self.lexicon_path)
-
   def _get_memory_usage(self) -> float:
     """
     Returns the current process memory usage in MB.
+
+    Reads /proc/self/statm directly, which costs a single open+read, instead
+    of going through the psutil Process abstraction; falls back to psutil on
+    platforms without procfs.
     """
-    return psutil.Process(os.getpid()).memory_info().rss / ONE_MB
+    try:
+      with open('/proc/self/statm') as statm_fp:
+        resident_pages = int(statm_fp.read().split()[1])
+      return resident_pages * os.sysconf('SC_PAGE_SIZE') / ONE_MB
+    except (OSError, ValueError):
+      return psutil.Process(os.getpid()).memory_info().rss / ONE_MB
 
   def _stream_documents(
     self,
@@ -152,35 +269,57 @@ class Indexer:
     number_of_workers: int
   ) -> int:
     """
-    Streams documents from the corpus into the input queue in batches.
+    Scans the memory-mapped corpus for line boundaries and streams batches of
+    (start, end) byte spans into the input queue.
+
+    The producer never decodes or parses a document: mmap.find locates the
+    newlines in C, and workers slice the same mapping by offset.
 
     Args:
-      queue (Queue): Queue to send document batches to.
+      queue (Queue): Queue to send span batches to.
       batch_size (int): Number of documents per batch.
+      number_of_workers (int): Total number of workers.
 
     Returns:
       int: Total number of documents streamed.
     """
     total_documents = 0
-    batch: List[Dict[str, str]] = []
-    
-    # Open the corpus file and read it line by line
-    with open(self.corpus_path, 'r', encoding='utf-8') as corpus_fp:
-      for line in corpus_fp:
-        doc = json.loads(line)
-
-        # Append the document to the batch
-        batch.append({"id": doc["id"], "text": doc["text"]})
-        total_documents += 1
-
-        # If the batch size is reached, put it in the queue
-        if len(batch) >= batch_size:
+    batch: List[Tuple[int, int]] = []
+
+    with open(self.corpus_path, 'rb') as corpus_fp:
+      # Ask the kernel to prefetch the corpus ahead of the scan. A
+      # zero-length file cannot be mapped; an empty corpus streams no
+      # documents and falls through to the end-of-stream sentinels
+      advise_sequential(corpus_fp, willneed=True)
+      if os.fstat(corpus_fp.fileno()).st_size > 0:
+        corpus_map = mmap.mmap(corpus_fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(corpus_map, 'madvise'):
+          # The corpus is scanned exactly once, front to back
+          corpus_map.madvise(mmap.MADV_SEQUENTIAL)
+
+        corpus_size = len(corpus_map)
+        position = 0
+        while position < corpus_size:
+          newline = corpus_map.find(b'\n', position)
+          if newline == -1:
+            newline = corpus_size
+
+          # Append the document's byte span to the batch, skipping blank lines
+          if newline > position:
+            batch.append((position, newline))
+            total_documents += 1
+          position = newline + 1
+
+          # If the batch size is reached, put it in the queue
+          if len(batch) >= batch_size:
+            queue.put(batch)
+            batch = []
+
+        # If there are any remaining documents in the batch, put them in the queue
+        if batch:
           queue.put(batch)
-          batch = []
 
-    # If there are any remaining documents in the batch, put them in the queue
-      if batch:
-        queue.put(batch)
+        corpus_map.close()
 
     # Signal the workers that there are no more documents
     for _ in range(number_of_workers):
@@ -211,27 +350,26 @@ class Indexer:
     # Print the assignment's required statistics
     print(json.dumps(stats, indent=2))
 
+    # Read and remove the worker statistics files in a single directory scan
     total_tokens = 0
     for file in os.listdir(self.index_dir):
       if file.startswith('worker_') and file.endswith('_stats.json'):
-        with open(os.path.join(self.index_dir, file), 'r') as stats_fp:
-          worker_stats = json.load(stats_fp)
+        worker_stats_path = os.path.join(self.index_dir, file)
+        with open(worker_stats_path, 'rb') as stats_fp:
+          worker_stats = orjson.loads(stats_fp.read())
           total_tokens += worker_stats.get("total_tokens", 0)
-    
+        os.remove(worker_stats_path)
+
     average_tokens_per_document = round(total_tokens / total_documents) if total_documents else 0
 
     # Save other useful statistics
     stats["Number of Documents"] = total_documents
     stats["Average Tokens per Document"] = average_tokens_per_document
 
-    # Write the statistics to a JSON file
-    with open(self.indexing_statistics_path, 'w', encoding='utf-8') as stats_fp:
-      json.dump(stats, stats_fp, indent=2)
-
-    # Clean worker statistics files
-    for file in os.listdir(self.index_dir):
-      if file.startswith('worker_') and file.endswith('_stats.json'):
-        os.remove(os.path.join(self.index_dir, file))
+    # Serialize the statistics in memory and write them in a single call,
+    # instead of letting json.dump trickle fragments into the file object
+    with open(self.indexing_statistics_path, 'wb') as stats_fp:
+      stats_fp.write(orjson.dumps(stats, option=orjson.OPT_INDENT_2))
 
   def run(self, number_of_workers: Optional[int] = None) -> None:
     """
@@ -240,10 +378,37 @@ class Indexer:
     Args:
       number_of_workers (Optional[int]): Number of worker processes. Defaults to CPU count or max 8.
     """
-    number_of_workers = number_of_workers or min(cpu_count(), 8)
+    # Size the pool from the affinity mask rather than the raw CPU count,
+    # so cgroup and container CPU quotas are respected
+    if hasattr(os, 'sched_getaffinity'):
+      usable_cpus = len(os.sched_getaffinity(0))
+    else:
+      usable_cpus = cpu_count()
+    number_of_workers = number_of_workers or min(usable_cpus, 8)
+
+    # Cap glibc malloc arenas in the children: with the default of
+    # 8 * ncpus, threaded workers can hold tens of MB of fragmented
+    # arena space that the budget accounting never sees. Must be set
+    # before any worker starts so they inherit it
+    os.environ.setdefault("MALLOC_ARENA_MAX", "2")
+
+    # Fork workers from a small preloaded template process instead of
+    # copying the parent's full heap: each worker starts with only the
+    # modules it needs resident rather than tens of MB of inherited state
+    multiprocessing.set_forkserver_preload([
+      'indexer.in_memory_indexer',
+      'indexer.partial_index_writer',
+      'shared.tokenizer',
+      'orjson',
+      'numpy',
+    ])
+    try:
+      multiprocessing.set_start_method('forkserver')
+    except RuntimeError:
+      # The start method can only be set once per process
+      pass
 
     input_queue = Queue(maxsize=16)
-    stop_event = Event()
     processes: List[Process] = []
 
     OVERHEAD_MB_PER_PROCESS = 40
@@ -255,30 +420,33 @@ class Indexer:
     for worker_id in range(number_of_workers):
       process = Process(
         target=index_worker,
-        args=(self.index_dir, functional_memory_budget_per_worker, input_queue, worker_id, number_of_workers, stop_event)
+        args=(self.index_dir, self.corpus_path, functional_memory_budget_per_worker, input_queue, worker_id, number_of_workers)
       )
       process.start()
       processes.append(process)
 
     # Measure overall timing
     total_start_time = time.time()
-    
+
     total_documents = self._stream_documents(input_queue, batch_size=1000, number_of_workers=number_of_workers)
 
     for process in processes:
       process.join()
 
+    # The merger is only built now so workers never inherit it
+    index_merger = IndexMerger(self.index_dir, self.final_index_path, self.document_index_path, self.lexicon_path)
+
     # Merge the partial indexes
     merge_start_time = time.time()
     print("Merging inverted indexes...")
-    total_postings, number_of_lists = self.index_merger.merge()
+    total_postings, number_of_lists = index_merger.merge()
     inverted_merge_time = time.time() - merge_start_time
     print(f"Inverted index merge time: {inverted_merge_time:.2f} seconds")
 
     # Merge the document indexes
     doc_merge_start_time = time.time()
     print("Merging document indexes...")
-    self.index_merger.merge_document_indexes()
+    index_merger.merge_document_indexes()
     document_merge_time = time.time() - doc_merge_start_time
     print(f"Document index merge time: {document_merge_time:.2f} seconds")
 
@@ -286,8 +454,6 @@ class Indexer:
 
     print(f"Total indexing time: {total_elapsed_time:.2f} seconds")
 
-    # Signal workers to stop
-    stop_event.set()
     print("Collecting statistics...")
     self._collect_statistics(total_postings, number_of_lists, total_elapsed_time, total_documents)
 
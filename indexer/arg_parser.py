@@ -1,26 +1,50 @@
 import argparse
+
+def _positive_int(value: str) -> int:
+  """
+  argparse type callable that validates a positive integer.
+
+  Args:
+    value (str): The value passed on the command line.
+
+  Returns:
+    int: The validated integer.
+  """
+  memory = int(value)
+  if memory <= 0:
+    raise argparse.ArgumentTypeError(f"'{value}' must be a positive integer.")
+  return memory
+
+def _jsonl_file(path: str) -> str:
+  """
+  argparse type callable that validates a .jsonl file path.
+
+  Args:
+    path (str): The path passed on the command line.
+
+  Returns:
+    str: The validated path.
+  """
+  if not path.endswith(".jsonl"):
+    raise argparse.ArgumentTypeError(f"'{path}' must be a .jsonl file.")
+  return path
+
 def parse_indexer_args() -> tuple:
   """
   Parses the indexer's command-line arguments.
   Returns:
     tuple: (memory_limit_mb, corpus_path, index_dir)
   """
-  # Initialize the argument parser
+  # Initialize the argument parser. Validation is declared on the arguments
+  # themselves (type callables), so argparse rejects bad values while
+  # parsing instead of in post-hoc checks
   parser = argparse.ArgumentParser(description="Indexer Argument Parser")
 
-  parser.add_argument("-m", "--memory_limit_mb", type=int, required=True, help="The memory available to the indexer in MB")
-  parser.add_argument("-c", "--corpus_path", type=str, required=True, help="The path to the corpus file to be indexed")
+  parser.add_argument("-m", "--memory_limit_mb", type=_positive_int, required=True, help="The memory available to the indexer in MB")
+  parser.add_argument("-c", "--corpus_path", type=_jsonl_file, required=True, help="The path to the corpus file to be indexed")
   parser.add_argument("-i", "--index_dir", type=str, required=True, help="The path to the directory where indexes should be written")
 
   # Parse the command-line arguments
   args = parser.parse_args()
 
-  # Validate that memory is positive 
-  if args.memory_limit_mb <= 0:
-    parser.error("Memory must be a positive integer.")
-
-  # Validate that the corpus file is a .jsonl file
-  if not args.corpus_path.endswith(".jsonl"):
-    parser.error("Corpus file must be a .jsonl file.")  
-
-  return args.memory_limit_mb, args.corpus_path, args.index_dir
\ No newline at end of file
+  return args.memory_limit_mb, args.corpus_path, args.index_dir
@@ -1,15 +1,12 @@
 import gc
-import os
-import sys
-import psutil
+from array import array
 from collections import defaultdict
-from typing import Dict
 
 ONE_MB = 1024 * 1024
 
 class InMemoryIndexer:
   """
-  Temporary in-memory indexer that maps tokens to (docid, frequency) pairs.
+  Temporary in-memory indexer that maps token ids to packed posting arrays.
 
   The index automatically flushes when the memory limit is reached.
   """
@@ -21,39 +18,47 @@ class InMemoryIndexer:
       memory_budget_mb (int): The memory budget in megabytes for the indexer process.
     """
     self.memory_budget_mb = memory_budget_mb
-    self.index = defaultdict(list)
-    
-    # Each entry is a tuple (docid, frequency). Since there will be considerably more append 
-    # operations than insertions of new tokens, we assume an amortized size for each entry.
-    # For instance, in 64-bit Python, the size of an integer is 28 bytes. The size of a 
-    # tuple with two integers is 56 bytes 
-    # (40 bytes for the tuple itself and 2 * 8 bytes for the integers pointers).
-    # Therefore, the total size in bytes is: 56 + 2 * 28 = 112 bytes.
-    self.entry_size = sys.getsizeof((0, 0)) + 2 * sys.getsizeof(0)
-    
+    # Struct-of-arrays postings: per token, one compact C array of docids and
+    # one of frequencies, instead of one ~112-byte Python tuple per posting;
+    # array appends grow the buffers geometrically at the C level
+    self.index = defaultdict(lambda: (array('i'), array('i')))
+
+    # Each entry is two 4-byte machine integers
+    self.entry_size = 2 * array('i').itemsize
+
     # Calculate the approximate maximum number of entries that can be stored in the
     # index before reaching the memory budget.
     self.entry_count = 0
     self.max_entries = (memory_budget_mb * ONE_MB) // self.entry_size
+    self.flush_count = 0
 
-  def index_document(self, docid: str, tokens_frequency_dict: Dict[str, int]) -> bool:
+  def index_document_ids(self, docid: int, token_ids: "np.ndarray", counts: "np.ndarray") -> bool:
     """
     Index a single document into the in-memory index.
 
+    The index is keyed by worker-local token ids; the id-to-token mapping is
+    resolved only when the index is written to disk.
+
     Args:
-      docid (str): Document identifier.
-      token_frequencies (Dict[str, int]): Mapping from token to its frequency in the document.
+      docid (int): Numeric document identifier.
+      token_ids (np.ndarray): Unique token ids present in the document.
+      counts (np.ndarray): Frequency of each token id in the document.
 
     Returns:
       bool: True if the memory budget was reached and the index should be flushed.
     """
-    for token in tokens_frequency_dict:
-      self.index[token].append((docid, tokens_frequency_dict[token]))
-      self.entry_count += 1
+    # Bind the index to a local name and keep the loop body short; the
+    # budget check runs once per document instead of per posting
+    index = self.index
+    for token_id, count in zip(token_ids.tolist(), counts.tolist()):
+      docids, frequencies = index[token_id]
+      docids.append(docid)
+      frequencies.append(count)
 
-      if self.entry_count >= self.max_entries:
-        self.entry_count = 0
-        return True
+    self.entry_count += len(counts)
+    if self.entry_count >= self.max_entries:
+      self.entry_count = 0
+      return True
 
     return False
 
@@ -63,6 +68,11 @@ class InMemoryIndexer:
 
     Should be called after the index is flushed to disk.
     """
-    self.index = defaultdict(list)
+    self.index = defaultdict(lambda: (array('i'), array('i')))
     self.entry_count = 0
-    gc.collect()
+    # A full gen-2 collection stalls the worker for a while and the index
+    # holds no reference cycles, so only collect occasionally to return
+    # fragmented memory to the allocator
+    self.flush_count += 1
+    if self.flush_count % 32 == 0:
+      gc.collect()
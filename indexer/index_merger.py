@@ -1,7 +1,40 @@
 import heapq
 import json
+import multiprocessing
 import os
-from typing import List, Optional, Tuple, TextIO, Dict
+import shutil
+import struct
+import msgpack
+import zstandard
+from typing import BinaryIO, Iterator, List, Optional, Tuple, TextIO
+
+from indexer.partial_index_writer import NUMBER_OF_SHARDS
+from shared.file_hints import advise_sequential
+
+# Fixed layout of one per-worker document index record:
+# 8-byte docid, 4-byte character count, 4-byte token count, little-endian
+DOCUMENT_RECORD = struct.Struct('<QII')
+
+# Frames are consumed with many small reads, so partial index files are
+# buffered well beyond the io module's 8 KB default to keep the actual
+# disk reads large and sequential
+MERGE_BUFFER_SIZE = 1024 * 1024
+
+def _merge_shard_task(merger_args: Tuple[str, str, str, str], shard_id: int) -> Tuple[int, int]:
+  """
+  Merges one shard's partial index files; run inside a pool worker.
+
+  Module-level so the pool can resolve it by name in the child process.
+
+  Args:
+    merger_args (Tuple[str, str, str, str]): Constructor arguments for IndexMerger.
+    shard_id (int): Shard to merge.
+
+  Returns:
+    Tuple[int, int]: (total_postings, number_of_lists) for this shard.
+  """
+  merger = IndexMerger(*merger_args)
+  return merger._merge_shard(shard_id)
 
 class IndexMerger:
   """
@@ -21,24 +54,35 @@ class IndexMerger:
     self.final_index_path = final_index_path
     self.document_index_path = document_index_path
     self.lexicon_path = lexicon_path
-    self.file_pointers: List[TextIO] = []
-    self.heap: List[Tuple[str, List[Tuple[str, int]], TextIO]] = []
+    self.decompressor = zstandard.ZstdDecompressor()
 
-  def _read_next_token_data(self, fp: TextIO) -> Optional[Tuple[str, List[Tuple[str, int]]]]:
+  def _read_next_token_data(self, fp: BinaryIO) -> Optional[Tuple[str, List[Tuple[str, int]]]]:
     """
-    Reads the next token and its postings list from a JSONL file.
+    Reads the next token frame from a binary partial index file.
+
+    Each frame is a 4-byte little-endian payload length followed by the
+    zstd-compressed msgpack encoding of (token, docid_gaps, frequencies),
+    where the docids are delta-gap encoded.
 
     Args:
-      fp (TextIO): File pointer.
+      fp (BinaryIO): File pointer.
 
     Returns:
       Optional[Tuple[str, List[Tuple[str, int]]]]: (token, postings) or None if EOF.
     """
-    line = fp.readline()
-    if not line:
+    header = fp.read(4)
+    if not header:
       return None
-    data = json.loads(line)
-    return data["token"], data["postings"]
+    payload = fp.read(int.from_bytes(header, 'little'))
+    token, gaps, frequencies = msgpack.unpackb(self.decompressor.decompress(payload))
+
+    # Undo the gap encoding, restoring the zero-padded docid strings
+    postings = []
+    docid = 0
+    for gap, frequency in zip(gaps, frequencies):
+      docid += gap
+      postings.append([f"{docid:07d}", frequency])
+    return token, postings
   
   def _save_token_to_lexicon(self, token: str, postings: List[Tuple[str, int]], lexicon_fp: TextIO) -> None:
     """
@@ -61,106 +105,245 @@ class IndexMerger:
     
     lexicon_fp.write(json.dumps(lexicon_entry) + '\n')
 
-  def merge(self) -> Tuple[int, int]:
+  def _merge_shard_files(self, shard_files: List[str], index_fp: TextIO, lexicon_fp: TextIO) -> Tuple[int, int]:
     """
-    Merges all partial inverted index files into a single final inverted index
-    and generates a corresponding lexicon file with token statistics.
+    Heap-merges the partial index files of a single shard into the final
+    index and lexicon.
+
+    Args:
+      shard_files (List[str]): Paths of the shard's partial index files.
+      index_fp (TextIO): File pointer to the final inverted index.
+      lexicon_fp (TextIO): File pointer to the lexicon file.
 
     Returns:
-      total_postings (int): Total number of postings across all tokens in the final index.
-      number_of_lists (int): Total number of unique tokens in the final index.
+      Tuple[int, int]: (total_postings, number_of_lists) for this shard.
     """
-    partial_index_files = [
-      os.path.join(self.index_dir, f)
-      for f in os.listdir(self.index_dir)
-      if f.startswith('partial_index_') and f.endswith('.jsonl')
-    ]
-    
-    self.file_pointers = [open(f, 'r') for f in partial_index_files]
-    for fp in self.file_pointers:
+    file_pointers = [open(f, 'rb', buffering=MERGE_BUFFER_SIZE) for f in shard_files]
+    heap: List[Tuple[str, List[Tuple[str, int]], BinaryIO]] = []
+    for fp in file_pointers:
+      # Partial indexes are consumed in a single sequential pass; willneed
+      # kicks off prefetch for every input before the merge starts reading
+      advise_sequential(fp, noreuse=True, willneed=True)
       token_data = self._read_next_token_data(fp)
       if token_data:
         token, postings = token_data
-        heapq.heappush(self.heap, (token, postings, fp))
+        heapq.heappush(heap, (token, postings, fp))
 
     # Initialize merge statistics
     total_postings = 0
     number_of_lists = 0
 
-    with open(self.final_index_path, 'w', encoding='utf-8') as index_fp, \
-         open(self.lexicon_path, 'w', encoding='utf-8') as lexicon_fp:
-      while self.heap:
-        # Get the first token (alphabetically) from the heap 
-        token, postings, fp = heapq.heappop(self.heap)
-        merged_postings = postings
-
-        # Merge postings for the same token
-        while self.heap and self.heap[0][0] == token:
-          _, more_postings, other_fp = heapq.heappop(self.heap)
-          merged_postings.extend(more_postings)
-
-          # Read the next token from the other file pointer and push it to the heap
-          next_token_data = self._read_next_token_data(other_fp)
-          if next_token_data:
-            next_token, next_postings = next_token_data
-            heapq.heappush(self.heap, (next_token, next_postings, other_fp))
-        
-        # Sort merged postings by document ID        
-        merged_postings.sort(key=lambda x: x[0])
-        
-        # Update statistics during merge
-        total_postings += len(merged_postings)
-        number_of_lists += 1
-
-        # Write merged token to index file
-        index_fp.write(json.dumps({"token": token, "postings": merged_postings}) + '\n')
-
-        # Save token to lexicon
-        self._save_token_to_lexicon(token, merged_postings, lexicon_fp)
-
-        # Read the next token from the current file pointer and push it to the heap
-        next_token_data = self._read_next_token_data(fp)
+    while heap:
+      # Get the first token (alphabetically) from the heap
+      token, postings, fp = heapq.heappop(heap)
+      posting_runs = [postings]
+
+      # Collect the token's posting runs from the other files
+      while heap and heap[0][0] == token:
+        _, more_postings, other_fp = heapq.heappop(heap)
+        posting_runs.append(more_postings)
+
+        # Read the next token from the other file pointer and push it to the heap
+        next_token_data = self._read_next_token_data(other_fp)
         if next_token_data:
           next_token, next_postings = next_token_data
-          heapq.heappush(self.heap, (next_token, next_postings, fp))
+          heapq.heappush(heap, (next_token, next_postings, other_fp))
+
+      # Each run is already sorted by docid (workers consume the corpus in
+      # file order), so merging the runs beats re-sorting the concatenation
+      if len(posting_runs) == 1:
+        merged_postings = posting_runs[0]
+      else:
+        merged_postings = list(heapq.merge(*posting_runs))
+
+      # Update statistics during merge
+      total_postings += len(merged_postings)
+      number_of_lists += 1
+
+      # Write merged token to index file
+      index_fp.write(json.dumps({"token": token, "postings": merged_postings}) + '\n')
+
+      # Save token to lexicon
+      self._save_token_to_lexicon(token, merged_postings, lexicon_fp)
+
+      # Read the next token from the current file pointer and push it to the heap
+      next_token_data = self._read_next_token_data(fp)
+      if next_token_data:
+        next_token, next_postings = next_token_data
+        heapq.heappush(heap, (next_token, next_postings, fp))
+
+    self._cleanup_files(file_pointers)
+
+    return total_postings, number_of_lists
+
+  def _merge_shard(self, shard_id: int) -> Tuple[int, int]:
+    """
+    Merges the partial index files of one shard into that shard's merged
+    index and lexicon files.
+
+    Args:
+      shard_id (int): Shard to merge.
+
+    Returns:
+      Tuple[int, int]: (total_postings, number_of_lists) for this shard.
+    """
+    shard_suffix = f'_shard{shard_id}.bin'
+    shard_files = [
+      os.path.join(self.index_dir, f)
+      for f in os.listdir(self.index_dir)
+      if f.startswith('partial_index_') and f.endswith(shard_suffix)
+    ]
+
+    shard_index_path = os.path.join(self.index_dir, f'merged_index_shard{shard_id}.jsonl')
+    shard_lexicon_path = os.path.join(self.index_dir, f'merged_lexicon_shard{shard_id}.jsonl')
+    with open(shard_index_path, 'w', encoding='utf-8', buffering=MERGE_BUFFER_SIZE) as index_fp, \
+         open(shard_lexicon_path, 'w', encoding='utf-8', buffering=MERGE_BUFFER_SIZE) as lexicon_fp:
+      advise_sequential(index_fp)
+      advise_sequential(lexicon_fp)
+      return self._merge_shard_files(shard_files, index_fp, lexicon_fp)
+
+  def merge(self) -> Tuple[int, int]:
+    """
+    Merges all partial inverted index files into a single final inverted index
+    and generates a corresponding lexicon file with token statistics.
+
+    Workers route each token to a shard by its first character, so the shards
+    are disjoint and lexicographically ordered: they are merged in parallel,
+    one pool task per shard, and concatenating the shard outputs in shard
+    order yields a globally sorted index.
+
+    Returns:
+      total_postings (int): Total number of postings across all tokens in the final index.
+      number_of_lists (int): Total number of unique tokens in the final index.
+    """
+    merger_args = (self.index_dir, self.final_index_path, self.document_index_path, self.lexicon_path)
+    pool_size = min(NUMBER_OF_SHARDS, os.cpu_count() or 1)
+    with multiprocessing.Pool(processes=pool_size) as pool:
+      shard_statistics = pool.starmap(
+        _merge_shard_task,
+        [(merger_args, shard_id) for shard_id in range(NUMBER_OF_SHARDS)]
+      )
+
+    total_postings = sum(postings for postings, _ in shard_statistics)
+    number_of_lists = sum(lists for _, lists in shard_statistics)
+
+    shard_index_paths = [
+      os.path.join(self.index_dir, f'merged_index_shard{shard_id}.jsonl')
+      for shard_id in range(NUMBER_OF_SHARDS)
+    ]
+    shard_lexicon_paths = [
+      os.path.join(self.index_dir, f'merged_lexicon_shard{shard_id}.jsonl')
+      for shard_id in range(NUMBER_OF_SHARDS)
+    ]
+
+    # Shards are disjoint and ordered, so the final files are plain concatenations
+    self._concatenate_files(shard_index_paths, self.final_index_path)
+    self._concatenate_files(shard_lexicon_paths, self.lexicon_path)
 
-    self._cleanup_files(self.file_pointers)
+    self._write_index_offsets()
 
     return total_postings, number_of_lists
 
+  def _write_index_offsets(self) -> None:
+    """
+    Writes a token -> (offset, length) sidecar for the final inverted index.
+
+    The sidecar lets the query processor jump straight to the lines it needs
+    with a single mmap instead of scanning the whole index at startup. The
+    pass never parses JSON: the token is sliced out of each line's bytes.
+    """
+    offsets_path = os.path.splitext(self.final_index_path)[0] + '.offsets.jsonl'
+    token_prefix = b'{"token": "'
+    prefix_length = len(token_prefix)
+    offset = 0
+    with open(self.final_index_path, 'rb', buffering=MERGE_BUFFER_SIZE) as index_fp, \
+         open(offsets_path, 'w', encoding='utf-8', buffering=MERGE_BUFFER_SIZE) as offsets_fp:
+      advise_sequential(index_fp, willneed=True)
+      for line in index_fp:
+        end = line.index(b'"', prefix_length)
+        token = line[prefix_length:end].decode()
+        offsets_fp.write(json.dumps({"token": token, "offset": offset, "length": len(line)}) + '\n')
+        offset += len(line)
+
+  def _concatenate_files(self, source_paths: List[str], destination_path: str) -> None:
+    """
+    Concatenates the source files into the destination and removes them.
+
+    Uses os.copy_file_range where available, which copies in kernel space
+    without moving the bytes through userspace buffers, then os.sendfile,
+    which is equally zero-copy but more widely supported, before falling
+    back to a userspace copy loop.
+
+    Args:
+      source_paths (List[str]): Paths of the files to concatenate, in order.
+      destination_path (str): Path of the concatenated output file.
+    """
+    with open(destination_path, 'wb') as destination_fp:
+      for source_path in source_paths:
+        with open(source_path, 'rb') as source_fp:
+          size = os.fstat(source_fp.fileno()).st_size
+          if hasattr(os, 'copy_file_range'):
+            remaining = size
+            while remaining > 0:
+              copied = os.copy_file_range(source_fp.fileno(), destination_fp.fileno(), remaining)
+              if copied == 0:
+                break
+              remaining -= copied
+          elif hasattr(os, 'sendfile'):
+            offset = 0
+            while offset < size:
+              sent = os.sendfile(destination_fp.fileno(), source_fp.fileno(), offset, size - offset)
+              if sent == 0:
+                break
+              offset += sent
+          else:
+            shutil.copyfileobj(source_fp, destination_fp, length=8 * 1024 * 1024)
+        os.remove(source_path)
+
+  def _iter_document_records(self, path: str) -> Iterator[Tuple[int, int, int]]:
+    """
+    Iterates the fixed-size records of a per-worker document index file,
+    removing the file once it is exhausted.
+
+    Args:
+      path (str): Path of the worker's binary document index file.
+
+    Yields:
+      Tuple[int, int, int]: (docid, character_count, token_count) per document.
+    """
+    with open(path, 'rb') as fp:
+      advise_sequential(fp, noreuse=True, willneed=True)
+      chunk_size = DOCUMENT_RECORD.size * 8192
+      while True:
+        chunk = fp.read(chunk_size)
+        if not chunk:
+          break
+        yield from DOCUMENT_RECORD.iter_unpack(chunk)
+    os.remove(path)
+
   def merge_document_indexes(self):
     """
     Merges document index files (metadata about documents) from multiple workers
     into a single sorted document index file.
+
+    Workers write fixed-size binary records; each worker's file is sorted by
+    docid, so the final JSONL index is a streaming k-way merge of the records.
     """
     document_index_files = [
       os.path.join(self.index_dir, f)
       for f in os.listdir(self.index_dir)
-      if f.startswith('document_index_worker_') and f.endswith('.jsonl')
+      if f.startswith('document_index_worker_') and f.endswith('.bin')
     ]
 
-    file_pointers = []
-    heap: List[Tuple[str, Dict, TextIO]] = []
-
-    for file in document_index_files:
-      fp = open(file, 'r', encoding='utf-8')
-      file_pointers.append(fp)
-      line = fp.readline()
-      if line:
-        doc = json.loads(line)
-        heapq.heappush(heap, (doc['id'], doc, fp))
-
+    record_streams = [self._iter_document_records(f) for f in document_index_files]
     with open(self.document_index_path, 'w', encoding='utf-8') as output_fp:
-      while heap:
-        # Get the smallest document ID from the heap
-        _, doc, fp = heapq.heappop(heap)
-        output_fp.write(json.dumps(doc) + '\n')
-
-        line = fp.readline()
-        if line:
-          next_doc = json.loads(line)
-          heapq.heappush(heap, (next_doc['id'], next_doc, fp))
-    self._cleanup_files(file_pointers)
+      for docid, character_count, token_count in heapq.merge(*record_streams):
+        document_metadata = {
+          "id": f"{docid:07d}",
+          "character_count": character_count,
+          "token_count": token_count
+        }
+        output_fp.write(json.dumps(document_metadata) + '\n')
 
   def _cleanup_files(self, file_pointers: List[TextIO]) -> None:
     """
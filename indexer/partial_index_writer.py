@@ -1,11 +1,52 @@
+import itertools
 import os
-import json
-from typing import Dict, List
+import msgpack
+import zstandard
+from typing import Dict, List, Tuple
+
+from shared.file_hints import advise_sequential
+
+# Number of term shards each flush is split into. Tokens are routed to a shard
+# by their first character, so a given token always lands in the same shard
+# regardless of the worker, and the merger only has to merge files within one
+# shard.
+NUMBER_OF_SHARDS = 8
+
+# Frames are staged in memory and written in batches of roughly this size,
+# so a flush issues a handful of large writes instead of one per token
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+
+# The shard mapping is monotone in lexicographic order: every token in shard k
+# sorts before every token in shard k+1. That lets the merger process shards
+# independently, in parallel, and still produce a globally sorted index by
+# plain concatenation.
+_FIRST_CHARS = '0123456789abcdefghijklmnopqrstuvwxyz'
+_CHAR_SHARDS = {
+  char: index * NUMBER_OF_SHARDS // len(_FIRST_CHARS)
+  for index, char in enumerate(_FIRST_CHARS)
+}
+
+def token_shard(token: str) -> int:
+  """
+  Returns the shard a token belongs to, based on its first character.
+
+  Args:
+    token (str): The token to route.
+
+  Returns:
+    int: Shard id in [0, NUMBER_OF_SHARDS).
+  """
+  return _CHAR_SHARDS.get(token[0], NUMBER_OF_SHARDS - 1)
 
 class PartialIndexWriter:
   """
   A class to handle writing the partial index to disk for each worker.
-  It creates a new index file every time it's flushed.
+  It creates a new set of per-shard index files every time it's flushed.
+
+  Partial indexes are written as a sequence of length-prefixed frames, one
+  per token: a 4-byte little-endian payload length followed by the
+  zstd-compressed msgpack encoding of (token, docid_gaps, frequencies),
+  with the docids delta-gap encoded.
   """
 
   def __init__(self, index_path: str, worker_id: int) -> None:
@@ -16,27 +57,54 @@ class PartialIndexWriter:
     """
     self.index_path = index_path
     self.worker_id = worker_id
-    # Counter to track the number of partial indexes written by this worker
-    self.counter = 0  
+    # Flush ids come from an itertools counter, which advances atomically
+    # under the GIL, so no lock is needed even with concurrent flushers
+    self._next_flush_id = itertools.count().__next__
+    # Level 1 trades a little compression ratio for fast flushes
+    self.compressor = zstandard.ZstdCompressor(level=1)
     os.makedirs(self.index_path, exist_ok=True)
 
-  def write_to_disk(self, index: Dict[str, List[Dict[str, int]]]) -> None:
+  def write_to_disk(self, index: Dict[int, Tuple], id_tokens: List[str]) -> None:
     """
     Writes the index to disk in a new file for each flush.
 
     Args:
-      index (dict[str, list]): The index to write to disk.
+      index (dict[int, tuple]): The index to write to disk, keyed by token id.
+        Each value is a (docids, frequencies) pair of parallel int arrays.
+      id_tokens (List[str]): Mapping from token id back to the token string.
     """
-    # Create a new file name for each flush
-    index_file_path = os.path.join(
-      self.index_path, f"partial_index_{self.worker_id}_{self.counter}.jsonl"
-    )
-    
-    with open(index_file_path, "w", encoding="utf-8") as file:
-      for token in sorted(index.keys()):
-        postings = index[token]
-        json_line = json.dumps({"token": token, "postings": postings})
-        file.write(json_line + "\n")
-    
-    # Increment flush counter for next time
-    self.counter += 1
\ No newline at end of file
+    flush_id = self._next_flush_id()
+
+    # Resolve token ids back to strings, keeping lexicographic order, and
+    # bucket the tokens into their shards
+    shard_items: List[List] = [[] for _ in range(NUMBER_OF_SHARDS)]
+    for token, postings in sorted((id_tokens[token_id], postings) for token_id, postings in index.items()):
+      shard_items[token_shard(token)].append((token, postings))
+
+    # Write one file per non-empty shard for this flush
+    for shard_id, items in enumerate(shard_items):
+      if not items:
+        continue
+      index_file_path = os.path.join(
+        self.index_path, f"partial_index_{self.worker_id}_{flush_id}_shard{shard_id}.bin"
+      )
+      with open(index_file_path, "wb") as file:
+        advise_sequential(file)
+        buffer = bytearray()
+        for token, (docids, frequencies) in items:
+          # Delta-gap encode the docids: gaps between consecutive docids are
+          # small, and msgpack writes small ints in one or two bytes, so the
+          # frames shrink well before zstd even sees them
+          gaps = []
+          previous_docid = 0
+          for docid in docids:
+            gaps.append(docid - previous_docid)
+            previous_docid = docid
+          payload = self.compressor.compress(msgpack.packb((token, gaps, frequencies.tolist())))
+          buffer += len(payload).to_bytes(4, 'little')
+          buffer += payload
+          if len(buffer) >= WRITE_BUFFER_SIZE:
+            file.write(buffer)
+            buffer.clear()
+        if buffer:
+          file.write(buffer)
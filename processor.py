@@ -1,13 +1,51 @@
-import heapq
 import json
+import mmap
+import multiprocessing
 import os
 import time
-from typing import List, Dict, Set, Tuple
+import orjson
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import FrozenSet, List, Dict, Optional, Set, Tuple
+
+ONE_MB = 1024 * 1024
 
 from processor.arg_parser import parse_processor_args
 from processor.scorer import Scorer
 from shared.tokenizer import Tokenizer
 
+# Processor shared with fork-based pool workers; set in process_queries so
+# children inherit the loaded index via copy-on-write instead of pickling it
+_query_processor: Optional["Processor"] = None
+
+def _process_query_task(query_index: int) -> Tuple[List[Tuple[float, int]], float, float]:
+  """
+  Matches and ranks one query against the shared processor state.
+
+  Runs inside a pool worker; queries only read the index structures, so
+  they can be scored independently across cores.
+
+  Args:
+    query_index: Position of the query in the processor's query list.
+
+  Returns:
+    Tuple of (results, matching_time, ranking_time) for the query.
+  """
+  processor = _query_processor
+  tokens = processor.query_tokens_list[query_index]
+
+  matching_start = time.time()
+  docids = processor._get_matching_docids(tokens)
+  matching_time = time.time() - matching_start
+
+  if not docids:
+    return [], matching_time, 0.0
+
+  ranking_start = time.time()
+  results = processor._rank_documents(tokens, docids)
+  ranking_time = time.time() - ranking_start
+  return results, matching_time, ranking_time
+
 class Processor:
   def __init__(self):
     """
@@ -23,9 +61,11 @@ class Processor:
 
     self.total_docs, self.avg_tokens_per_doc = self._load_indexing_statistics()
     self.queries = self._load_queries()
-    self.query_tokens_list = [self.tokenizer.tokenize(q) for q in self.queries]
+    # Token lists are never mutated after tokenization, so store them as
+    # tuples; the combined vocabulary is likewise a frozenset
+    self.query_tokens_list = [tuple(self.tokenizer.tokenize(q)) for q in self.queries]
 
-    needed_tokens = set().union(*self.query_tokens_list)
+    needed_tokens = frozenset().union(*self.query_tokens_list)
 
     lexicon_start = time.time()
     self.lexicon = self._load_jsonl_with_filter("lexicon.jsonl", key='token', keys_filter=needed_tokens)
@@ -43,6 +83,7 @@ class Processor:
       ranker=self.ranker
     )
 
+
     init_time = time.time() - init_start_time
 
     print(f"Processor initialized in {init_time:.4f}s")
@@ -58,8 +99,8 @@ class Processor:
       Tuple of (total_docs, avg_tokens_per_doc)
     """
     stats_path = os.path.join(self.index_dir, "indexing_statistics.json")
-    with open(stats_path, 'r', encoding='utf-8') as f:
-      stats = json.load(f)
+    with open(stats_path, 'rb') as f:
+      stats = orjson.loads(f.read())
     return stats.get("Number of Documents", 0), stats.get("Average Tokens per Document", 0)
 
   def _load_queries(self) -> List[str]:
@@ -72,22 +113,94 @@ class Processor:
     with open(self.queries_file_path, 'r', encoding='utf-8') as f:
       return [line.strip() for line in f if line.strip()]
 
-  def _load_inverted_index(self, needed_tokens: Set[str]) -> Dict[str, List[Tuple[str, int]]]:
+  def _load_inverted_index(self, needed_tokens: FrozenSet[str]) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
     """
     Loads the inverted index filtering by needed tokens.
 
+    Posting lists are stored as parallel numpy arrays of int docids and
+    frequencies, sorted by docid, instead of lists of string pairs: a
+    1M-posting term costs 8 MB of contiguous ints rather than tens of MB
+    of PyObject tuples, and intersections run as sorted-array merges.
+
     Args:
       needed_tokens: Set of tokens required.
 
     Returns:
-      Dictionary mapping token to list of (docid, frequency).
+      Dictionary mapping token to (docids, frequencies) arrays sorted by docid.
     """
+    offsets_path = os.path.splitext(self.index_file_path)[0] + '.offsets.jsonl'
+    if os.path.exists(offsets_path):
+      return self._load_inverted_index_from_offsets(offsets_path, needed_tokens)
+
+    # No sidecar (older index): fall back to scanning the whole file. The
+    # token is the first field of every line, so it can be sliced out of
+    # the raw bytes and checked against the query vocabulary before paying
+    # for a JSON parse; almost every line is skipped unparsed
     index = {}
-    with open(self.index_file_path, 'r', encoding='utf-8') as f:
+    token_prefix = b'{"token": "'
+    prefix_length = len(token_prefix)
+    needed = {token.encode() for token in needed_tokens}
+    with open(self.index_file_path, 'rb', buffering=ONE_MB) as f:
       for line in f:
-        token, postings = json.loads(line).values()
-        if token in needed_tokens:
-          index[token] = postings
+        end = line.index(b'"', prefix_length)
+        if line[prefix_length:end] not in needed:
+          continue
+        token, postings = orjson.loads(line).values()
+        index[token] = self._posting_arrays(postings)
+    return index
+
+  def _posting_arrays(self, postings: List[Tuple[str, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts a parsed posting list into sorted parallel numpy arrays.
+
+    Args:
+      postings: List of (docid, frequency) pairs, sorted by docid.
+
+    Returns:
+      Tuple of (docids, frequencies) uint32 arrays.
+    """
+    docids = np.fromiter((int(docid) for docid, _ in postings), dtype=np.uint32, count=len(postings))
+    frequencies = np.fromiter((frequency for _, frequency in postings), dtype=np.uint32, count=len(postings))
+    return docids, frequencies
+
+  def _load_inverted_index_from_offsets(
+    self,
+    offsets_path: str,
+    needed_tokens: FrozenSet[str]
+  ) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Loads only the needed index lines through the byte-offset sidecar.
+
+    The sidecar maps each token to the (offset, length) of its line in the
+    index file, so the processor reads just those line spans from an mmap of
+    the index instead of scanning the whole file.
+
+    Args:
+      offsets_path: Path to the offsets sidecar file.
+      needed_tokens: Set of tokens required.
+
+    Returns:
+      Dictionary mapping token to (docids, frequencies) arrays sorted by docid.
+    """
+    spans = []
+    token_prefix = b'{"token": "'
+    prefix_length = len(token_prefix)
+    needed = {token.encode() for token in needed_tokens}
+    with open(offsets_path, 'rb', buffering=ONE_MB) as f:
+      for line in f:
+        end = line.index(b'"', prefix_length)
+        if line[prefix_length:end] not in needed:
+          continue
+        entry = orjson.loads(line)
+        spans.append((entry['offset'], entry['length']))
+
+    index = {}
+    with open(self.index_file_path, 'rb') as f:
+      index_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+      for offset, length in spans:
+        token, postings = orjson.loads(index_map[offset:offset + length]).values()
+        index[token] = self._posting_arrays(postings)
+      index_map.close()
     return index
 
   def _load_jsonl_with_filter(
@@ -109,58 +222,93 @@ class Processor:
     """
     path = os.path.join(self.index_dir, filename)
     result = {}
-    with open(path, 'r', encoding='utf-8') as f:
+    # Both filtered files put the key first on each line, so the value can be
+    # sliced out of the raw bytes and lines outside the filter are skipped
+    # without a JSON parse
+    key_prefix = f'{{"{key}": "'.encode()
+    prefix_length = len(key_prefix)
+    needed = {value.encode() for value in keys_filter}
+    with open(path, 'rb', buffering=ONE_MB) as f:
       for line in f:
-        item = json.loads(line)
-        if item[key] in keys_filter:
-          result[item[key]] = item
+        end = line.index(b'"', prefix_length)
+        if line[prefix_length:end] not in needed:
+          continue
+        item = orjson.loads(line)
+        result[item[key]] = item
     return result
 
-  def _get_matching_docids(self, tokens: List[str]) -> Set[str]:
+  def _load_document_index(self, docids: Set[int]) -> Dict[int, Dict]:
     """
-    Retrieves document IDs that contain all the tokens in the query
-    (AND operation over posting lists).
+    Loads document metadata for the given documents, keyed by int docid.
 
     Args:
-      tokens: List of tokens in the query.
+      docids: Set of int document IDs to load.
 
     Returns:
-      Set of matching document IDs.
+      Dictionary mapping int docid to the document's metadata.
     """
-    postings = [set(docid for docid, _ in self.inverted_index.get(token, [])) for token in tokens]
-    return set.intersection(*postings) if postings else set()
+    path = os.path.join(self.index_dir, "document_index.jsonl")
+    result = {}
+    # Same byte-level filter as _load_jsonl_with_filter, with the docids
+    # formatted back to the file's zero-padded strings for the comparison
+    id_prefix = b'{"id": "'
+    prefix_length = len(id_prefix)
+    needed = {f"{docid:07d}".encode() for docid in docids}
+    with open(path, 'rb', buffering=ONE_MB) as f:
+      for line in f:
+        end = line.index(b'"', prefix_length)
+        if line[prefix_length:end] not in needed:
+          continue
+        item = orjson.loads(line)
+        result[int(item['id'])] = item
+    return result
 
-  def _score_document(self, docid: str, tokens: List[str]) -> float:
+  def _get_matching_docids(self, tokens: Tuple[str, ...]) -> Set[int]:
     """
-    Computes the relevance score of a document for a given query.
+    Retrieves document IDs that contain all the tokens in the query
+    (AND operation over posting lists).
 
     Args:
-      docid: Document ID.
       tokens: List of tokens in the query.
 
     Returns:
-      Document score as a float.
+      Set of matching document IDs as ints.
     """
-    score = 0.0
+    posting_arrays = []
     for token in tokens:
-      postings = self.inverted_index.get(token, [])
-      for posting_docid, frequency in postings:
-        if posting_docid == docid:
-          if self.ranker == "tfidf":
-            score += self.scorer.compute_tfidf(token, frequency, docid)
-          elif self.ranker == "bm25":
-            score += self.scorer.compute_bm25(token, frequency, docid)
-    return score
+      entry = self.inverted_index.get(token)
+      if entry is None:
+        # AND semantics: a query token absent from the index matches nothing
+        return set()
+      posting_arrays.append(entry[0])
+    if not posting_arrays:
+      return set()
+
+    # Intersect starting from the rarest term so every merge is bounded by
+    # the smallest list so far, and bail out as soon as it runs empty.
+    # The arrays are sorted and duplicate-free, so each intersection is a
+    # linear merge over contiguous ints instead of hashed set probes
+    posting_arrays.sort(key=len)
+    matching = posting_arrays[0]
+    for docids in posting_arrays[1:]:
+      matching = np.intersect1d(matching, docids, assume_unique=True)
+      if matching.size == 0:
+        return set()
+    return set(matching.tolist())
 
   def _rank_documents(
-    self, 
-    query_tokens: List[str], 
-    docids: Set[str], 
+    self,
+    query_tokens: Tuple[str, ...],
+    docids: Set[int],
     k: int = 10
-  ) -> List[Tuple[float, str]]:
+  ) -> List[Tuple[float, int]]:
     """
     Ranks documents based on their scores for a given query.
 
+    IDF is constant per (query, token) and the BM25 length normalization
+    depends only on the document, so both are computed once up front
+    instead of once per (document, token) pair inside the scoring loop.
+
     Args:
       query_tokens: List of tokens from the query.
       docids: Set of candidate document IDs.
@@ -169,23 +317,41 @@ class Processor:
     Returns:
       List of tuples (score, docid) sorted by score descending.
     """
-    heap = []
-    for docid in docids:
-      score = self._score_document(docid, query_tokens)
-      heapq.heappush(heap, (score, docid))
-    return heapq.nlargest(k, heap)
-
-  def _display_results(self, query: str, results: List[Tuple[float, str]]):
+    # Candidates and their lengths as arrays; every candidate appears in
+    # every query token's posting list, so term frequencies are gathered
+    # with one searchsorted per token and the score sum is fully vectorized
+    candidates = np.fromiter(docids, dtype=np.uint32, count=len(docids))
+    candidates.sort()
+    candidate_docids = candidates.tolist()
+
+    scores = self.scorer.score_query(query_tokens, candidates, self.inverted_index)
+
+    # Select the k best in O(n) with argpartition and only sort those.
+    # argpartition breaks exact score ties arbitrarily, so every candidate
+    # tied with the k-th score is pulled in as well and the survivors are
+    # resolved by the same (score, docid) descending order a full sort
+    # would produce before truncating to k
+    if len(scores) > k:
+      boundary_score = scores[np.argpartition(scores, -k)[-k:]].min()
+      top = np.nonzero(scores >= boundary_score)[0]
+    else:
+      top = np.arange(len(scores))
+    return sorted(((scores[i], candidate_docids[i]) for i in top.tolist()), reverse=True)[:k]
+
+  def _display_results(self, query: str, results: List[Tuple[float, int]]):
     """
     Prints the results for a query in JSON format.
 
+    Docids stay ints throughout the pipeline and are only formatted back to
+    the zero-padded strings here.
+
     Args:
       query: The original query string.
       results: List of (score, docid) tuples.
     """
     output = {
       "Query": query,
-      "Results": [{"ID": docid, "Score": score} for score, docid in results]
+      "Results": [{"ID": f"{docid:07d}", "Score": score} for score, docid in results]
     }
     print(json.dumps(output, indent=2, ensure_ascii=False))
 
@@ -200,41 +366,39 @@ class Processor:
     doc_loading_start = time.time()
     all_docids = set().union(*(self._get_matching_docids(tokens) for tokens in self.query_tokens_list))
     
-    self.scorer.document_index = self._load_jsonl_with_filter(
-      "document_index.jsonl",
-      key='id',
-      keys_filter=all_docids
-    )
+    # The scorer builds its dense per-document length arrays from this
+    self.scorer.set_document_index(self._load_document_index(all_docids))
     doc_loading_time = time.time() - doc_loading_start
     print(f"  - Document index loaded in {doc_loading_time:.4f}s ({len(all_docids)} documents)")
 
+    # Queries only read the loaded structures, so they are scored in
+    # parallel by a fork-based pool whose workers share this process's
+    # state copy-on-write; map preserves the query order
+    global _query_processor
+    _query_processor = self
+    max_workers = min(len(self.queries), os.cpu_count() or 1) or 1
     timing_statistics = []
-    for i, query in enumerate(self.queries):
-      tokens = self.query_tokens_list[i]
-      # Measure document matching time
-      matching_start = time.time()
-      docids = self._get_matching_docids(tokens)
-      matching_time = time.time() - matching_start
-
-      # Measure ranking time
-      ranking_start = time.time()
-      if not docids:
-        results = []
-        ranking_time = 0.0
-      else:
-        results = self._rank_documents(tokens, docids)
-        ranking_time = time.time() - ranking_start
-
-      # Store timing statistics
-      total_query_time = matching_time + ranking_time
-      timing_statistics.append({
-      'query_id': i,
-      'matching_time': matching_time,
-      'ranking_time': ranking_time,
-      'total_time': total_query_time
-      })
-
-      self._display_results(query, results)
+    try:
+      with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context('fork')
+      ) as pool:
+        query_outcomes = pool.map(
+          _process_query_task,
+          range(len(self.queries)),
+          chunksize=max(1, len(self.queries) // (max_workers * 4))
+        )
+        for i, (results, matching_time, ranking_time) in enumerate(query_outcomes):
+          timing_statistics.append({
+          'query_id': i,
+          'matching_time': matching_time,
+          'ranking_time': ranking_time,
+          'total_time': matching_time + ranking_time
+          })
+
+          self._display_results(self.queries[i], results)
+    finally:
+      _query_processor = None
 
     # Print average timing statistics
     if timing_statistics:
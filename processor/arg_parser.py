@@ -1,25 +1,35 @@
 import argparse
+
+def _jsonl_file(path: str) -> str:
+  """
+  argparse type callable that validates a .jsonl file path.
+
+  Args:
+    path (str): The path passed on the command line.
+
+  Returns:
+    str: The validated path.
+  """
+  if not path.endswith(".jsonl"):
+    raise argparse.ArgumentTypeError(f"'{path}' must be a .jsonl file.")
+  return path
+
 def parse_processor_args() -> tuple:
   """
   Parses the processor's command-line arguments.
   Returns:
     tuple: (index_file_path, queries_file_path, ranker)
   """
-  # Initialize the argument parser
+  # Initialize the argument parser. Validation is declared on the arguments
+  # themselves (type callables and choices), so argparse rejects bad values
+  # while parsing instead of in post-hoc checks
   parser = argparse.ArgumentParser(description="Processor Argument Parser")
 
-  parser.add_argument("-i", "--index_file_path", type=str, required=True, help="The path to the index file.")
+  parser.add_argument("-i", "--index_file_path", type=_jsonl_file, required=True, help="The path to the index file.")
   parser.add_argument("-q", "--queries_file_path", type=str, required=True, help="The path to a file with the list of queries to be processed.")
-  parser.add_argument("-r", "--ranker", type=str, required=True, help="A string informing the ranking function to be used to score documents for each query. Options are: 'bm25', 'tfidf'.")
+  parser.add_argument("-r", "--ranker", type=str, choices=['bm25', 'tfidf'], required=True, help="A string informing the ranking function to be used to score documents for each query.")
 
   # Parse the command-line arguments
   args = parser.parse_args()
 
-  # Validate that the index file is a .jsonl file
-  if not args.index_file_path.endswith(".jsonl"):
-    parser.error("Index file must be a .jsonl file.")  
-   
-  if args.ranker not in ['bm25', 'tfidf']:
-    parser.error("Ranker must be one of the following: 'bm25', 'tfidf'.")
-
-  return args.index_file_path, args.queries_file_path, args.ranker
\ No newline at end of file
+  return args.index_file_path, args.queries_file_path, args.ranker
@@ -1,5 +1,5 @@
 import numpy as np
-from typing import Dict
+from typing import Dict, Tuple
 
 class Scorer:
   def __init__(
@@ -23,16 +23,72 @@ class Scorer:
       k1 (float): BM25 term frequency saturation parameter.
       b (float): BM25 length normalization parameter.
     """
-    self.lexicon = lexicon
     self.document_index = document_index
     self.total_documents = total_documents
     self.average_document_token_count = average_document_token_count
     self.k1 = k1
     self.b = b
     self.ranker = ranker
-    
-    # Cache for IDF values to avoid recomputation
-    self._idf_cache: Dict[str, float] = {}
+
+    # Dense document length array, built when the document index is set
+    self.doc_lengths: np.ndarray = np.zeros(0)
+    self._Kd: np.ndarray = np.zeros(0)
+    self._k1_plus_1 = k1 + 1
+
+    # The lexicon's nested dicts are normalized into parallel arrays keyed
+    # by dense token ids: one dict probe resolves a token to its id, and
+    # its statistics are indexed loads instead of string-keyed lookups in
+    # a per-term dict. The nested dicts are not retained
+    self._token_ids = {token: token_id for token_id, token in enumerate(lexicon)}
+    self.document_frequencies = np.fromiter(
+      (token_info['document_frequency'] for token_info in lexicon.values()),
+      dtype=np.int32, count=len(lexicon)
+    )
+    self.corpus_frequencies = np.fromiter(
+      (token_info['corpus_frequency'] for token_info in lexicon.values()),
+      dtype=np.int64, count=len(lexicon)
+    )
+
+    # IDF depends only on the ranker and each token's document frequency,
+    # all fixed for the process, so compute it for the whole loaded
+    # vocabulary with one vectorized log here; a lookup is then a single
+    # dict probe and an indexed load, with no lazy computation or cache
+    document_frequencies = self.document_frequencies.astype(np.float64)
+    # The ranker is fixed for the process, so resolve it to its IDF
+    # formula and batch kernel once here; no call site branches on it
+    if ranker == "bm25":
+      self._idf_array = np.log(
+        1 + (total_documents - document_frequencies + 0.5) / (document_frequencies + 0.5)
+      )
+      self.score_postings = self._score_postings_bm25
+    elif ranker == "tfidf":
+      self._idf_array = np.log((total_documents + 1) / (document_frequencies + 1))
+      self.score_postings = self._score_postings_tfidf
+    else:
+      raise ValueError(f"Unknown ranker: {ranker}. Use 'bm25' or 'tfidf'.")
+
+  def set_document_index(self, document_index: Dict[int, Dict]) -> None:
+    """
+    Sets the document index and precomputes the per-document length data.
+
+    Document lengths are laid out in a dense float array indexed by docid,
+    so scoring gathers them with one fancy-index instead of a dict lookup
+    per document, and the BM25 length normalization term is computed once
+    per document here instead of once per (token, document) pair.
+
+    Args:
+      document_index (Dict[int, Dict]): Mapping from int docid to the
+        document's metadata.
+    """
+    self.document_index = document_index
+    max_docid = max(document_index, default=0)
+    self.doc_lengths = np.zeros(max_docid + 1, dtype=np.float64)
+    for docid, document in document_index.items():
+      self.doc_lengths[docid] = document['token_count']
+    # The full BM25 denominator constant k1 * (1 - b + b * dl / avgdl) is
+    # fixed per document, so fold it into one array here; scoring then only
+    # adds the term frequency to the gathered constant
+    self._Kd = self.k1 * (1 - self.b + self.b * (self.doc_lengths / self.average_document_token_count))
 
   def compute_idf(self, token: str) -> float:
     """
@@ -41,71 +97,73 @@ class Scorer:
     Returns:
       float: IDF score.
     """
-    key = (self.ranker, token)
-
-    if key in self._idf_cache:
-      return self._idf_cache[key]
-
-    token_info = self.lexicon.get(token)
-    if not token_info:
+    token_id = self._token_ids.get(token)
+    if token_id is None:
       return 0.0
+    return self._idf_array[token_id]
 
-    df = token_info['document_frequency']
-
-    if self.ranker == "bm25":
-      idf = np.log(1 + (self.total_documents - df + 0.5) / (df + 0.5))
-    elif self.ranker == "tfidf":
-      idf = np.log((self.total_documents + 1) / (df + 1))
-    else:
-      raise ValueError(f"Unknown ranker: {self.ranker}. Use 'bm25' or 'tfidf'.")
-
-    self._idf_cache[key] = idf
-    return idf
-
-  def compute_tfidf(self, token: str, term_frequency: int, docid: str) -> float:
+  def _score_postings_bm25(self, token: str, docids: np.ndarray, frequencies: np.ndarray) -> np.ndarray:
     """
-    Compute TF-IDF score for a token in a document.
+    BM25 batch kernel; bound to score_postings at construction.
+
+    The whole batch is computed with vectorized operations over the
+    precomputed length arrays, so the per-posting work runs as one
+    C-level loop instead of a Python call per (token, document) pair.
 
     Args:
       token (str): Token to score.
-      term_frequency (int): Frequency of token in the document.
-      docid (str): Document ID.
+      docids (np.ndarray): Document ids to score, as ints.
+      frequencies (np.ndarray): Frequency of the token in each document.
 
     Returns:
-      float: TF-IDF score.
+      np.ndarray: One score per document, parallel to docids.
     """
-    doc_info = self.document_index.get(docid)
-    if not doc_info:
-        return 0.0
-
-    tf = term_frequency / doc_info['token_count']
     idf = self.compute_idf(token)
+    frequencies = frequencies.astype(np.float64)
+    return idf * (frequencies * self._k1_plus_1) / (frequencies + self._Kd[docids])
 
-    return tf * idf
-
-  def compute_bm25(self, token: str, term_frequency: int, docid: str) -> float:
+  def _score_postings_tfidf(self, token: str, docids: np.ndarray, frequencies: np.ndarray) -> np.ndarray:
     """
-    Compute BM25 score for a token in a document.
+    TF-IDF batch kernel; bound to score_postings at construction.
 
     Args:
       token (str): Token to score.
-      term_frequency (int): Frequency of token in the document.
-      docid (str): Document ID.
+      docids (np.ndarray): Document ids to score, as ints.
+      frequencies (np.ndarray): Frequency of the token in each document.
 
     Returns:
-      float: BM25 score.
+      np.ndarray: One score per document, parallel to docids.
     """
     idf = self.compute_idf(token)
+    frequencies = frequencies.astype(np.float64)
+    return idf * (frequencies / self.doc_lengths[docids])
 
-    doc_info = self.document_index.get(docid)
-    token_count = doc_info['token_count']
+  def score_query(
+    self,
+    query_tokens: Tuple[str, ...],
+    candidates: np.ndarray,
+    inverted_index: Dict[str, Tuple[np.ndarray, np.ndarray]]
+  ) -> np.ndarray:
+    """
+    Scores a whole query over the candidate documents in one call.
 
-    numerator = term_frequency * (self.k1 + 1)
-    denominator = term_frequency + self.k1 * (
-      1 - self.b + self.b * (token_count / self.average_document_token_count)
-    )
+    Every candidate appears in every query token's posting list, so each
+    token's term frequencies are gathered with a single searchsorted and
+    accumulated through the vectorized kernel — one numpy pass per token
+    rather than any per-(token, document) work.
 
-    if denominator == 0:
-      return 0.0
+    Args:
+      query_tokens (Tuple[str, ...]): Tokens from the query.
+      candidates (np.ndarray): Sorted array of candidate docids.
+      inverted_index (Dict): Mapping from token to (docids, frequencies)
+        posting arrays sorted by docid.
 
-    return idf * (numerator / denominator)
+    Returns:
+      np.ndarray: One accumulated score per candidate.
+    """
+    scores = np.zeros(len(candidates))
+    for token in query_tokens:
+      posting_docids, frequencies = inverted_index[token]
+      gathered = frequencies[np.searchsorted(posting_docids, candidates)]
+      scores += self.score_postings(token, candidates, gathered)
+    return scores
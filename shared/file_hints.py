@@ -0,0 +1,24 @@
+import os
+
+def advise_sequential(fp, noreuse: bool = False, willneed: bool = False) -> None:
+  """
+  Tells the kernel a file will be read or written sequentially.
+
+  Doubles kernel readahead for sequential scans and, with noreuse, lets the
+  kernel evict the pages promptly instead of keeping them in page cache.
+  No-op on platforms without posix_fadvise.
+
+  Args:
+    fp: An open file object.
+    noreuse (bool): Also flag the data as accessed only once.
+    willneed (bool): Also ask the kernel to start prefetching the file now.
+  """
+  if not hasattr(os, 'posix_fadvise'):
+    return
+
+  # Advice values are not flags, so each hint is its own call
+  os.posix_fadvise(fp.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+  if noreuse:
+    os.posix_fadvise(fp.fileno(), 0, 0, os.POSIX_FADV_NOREUSE)
+  if willneed:
+    os.posix_fadvise(fp.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
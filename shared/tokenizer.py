@@ -1,44 +1,92 @@
+import re
+import sys
 import nltk
+from functools import lru_cache
 from typing import List
 from nltk.corpus import stopwords
-from nltk.stem import SnowballStemmer 
-from nltk.tokenize import word_tokenize
+from nltk.stem import SnowballStemmer
+
+try:
+  # snowballstemmer runs the same Snowball English algorithm but delegates
+  # to the C-backed PyStemmer when it is installed, removing the per-token
+  # Python overhead of NLTK's implementation
+  import snowballstemmer
+except ImportError:
+  snowballstemmer = None
 
-nltk.download('punkt', quiet=True)
 nltk.download('stopwords', quiet=True)
 
+# Compiled once at import time. A plain character class never backtracks and
+# the compiled pattern is shared by every Tokenizer instance in the process.
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
 class Tokenizer:
   """
-  A class to handle tokenization of text using NLTK.
+  A class to handle tokenization of text using a precompiled word regex.
   """
-  
+
   def __init__(self):
     """
     Initializes the Tokenizer class.
     """
-    # Initialize the stemmer
-    self.stemmer = SnowballStemmer('english')
-    
-    # Initialize the stop words
-    self.stop_words = set(stopwords.words('english'))
+    # Word pattern shared across instances; it also filters out punctuation
+    self.word_pattern = WORD_PATTERN
+
+    # Initialize the stemmer, preferring the C-backed implementation
+    if snowballstemmer is not None:
+      stem_word = snowballstemmer.stemmer('english').stemWord
+    else:
+      stem_word = SnowballStemmer('english').stem
+
+    # Stop words are kept as stemmed forms in a frozenset: the index
+    # vocabulary is stem-space, so filtering in the same space is
+    # consistent and also drops inflected variants that stem to a stop word
+    self.stop_words = frozenset(stem_word(word) for word in stopwords.words('english'))
+
+    # Word frequencies are Zipfian, so the same tokens are stemmed over and
+    # over; memoize the stemmed-and-interned result per word. The bound
+    # comfortably covers a corpus vocabulary while capping memory
+    @lru_cache(maxsize=1 << 18)
+    def stem_token(word: str) -> str:
+      return sys.intern(stem_word(word))
+    self._stem = stem_token
 
   def tokenize(self, text: str) -> List[str]:
     """
-    Tokenizes the input text into words using NLTK's word_tokenize function.
-    
+    Tokenizes the input text into words using the precompiled word pattern.
+
     Args:
         text (str): The input text to tokenize.
-        
+
     Returns:
         list: A list of tokens (words).
     """
     if not isinstance(text, str):
       raise ValueError("Input text must be a string.")
 
-    # Tokenize the text
-    tokens = word_tokenize(text)
+    # Lowercase once, extract the words in a single regex pass, then stem
+    # through the memoized cache and filter stop words on the stemmed form,
+    # in one fused pass: repeated occurrences of a word skip the stemmer
+    # entirely and share one interned str object, so downstream dict probes
+    # shortcut on identity. The cache and stop-word set are bound to locals
+    # so the loop avoids an attribute lookup per token
+    stem = self._stem
+    stop_words = self.stop_words
+    return [
+      stemmed for word in self.word_pattern.findall(text.lower())
+      if (stemmed := stem(word)) not in stop_words
+    ]
+
+  def tokenize_batch(self, texts: List[str]) -> List[List[str]]:
+    """
+    Tokenizes a batch of texts in a single call.
 
-    # Remove punctuation, convert to lowercase and stem the words
-    tokens = [self.stemmer.stem(word.lower()) for word in tokens if word.lower() not in self.stop_words]
+    Amortizes per-call overhead when many documents are tokenized at once.
 
-    return tokens
\ No newline at end of file
+    Args:
+        texts (List[str]): The input texts to tokenize.
+
+    Returns:
+        list: One list of tokens per input text.
+    """
+    return [self.tokenize(text) for text in texts]
\ No newline at end of file